@@ -1,20 +1,47 @@
 #!/usr/bin/env python3
 
 import sys
-import json
 import logging
 import os
-from datetime import datetime, timedelta
+import functools
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
 from typing import Dict, Any, Optional, List
+import anyio
 import boto3
 import exceptiongroup
+from cachetools import TTLCache
+from botocore.config import Config
 from botocore.exceptions import ClientError, NoCredentialsError
 from mcp.server.fastmcp import FastMCP
 
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+try:
+    import orjson
+except ImportError:
+    # json de la biblioteca estándar solo se carga si falta orjson
+    import json
+    orjson = None
+
+try:
+    from ciso8601 import parse_datetime
+except ImportError:
+    def parse_datetime(value: str) -> datetime:
+        """Respaldo sin ciso8601 (fromisoformat no acepta 'Z' antes de Python 3.11)"""
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
 # CRÍTICO: Configurar logging solo a stderr para MCP
 logging.basicConfig(
     level=getattr(logging, os.getenv('LOG_LEVEL', 'INFO')),
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    # Marca de tiempo epoch: evita el strftime de %(asctime)s en cada registro
+    format='%(created).3f - %(name)s - %(levelname)s - %(message)s',
     stream=sys.stderr,  # SOLO stderr
     force=True
 )
@@ -27,6 +54,54 @@ def debug_print(*args, **kwargs):
 # Crear el servidor MCP
 mcp = FastMCP("sitewise-mcp-server")
 
+# Tamaño máximo de página aceptado por las APIs List* de SiteWise
+MAX_PAGE_SIZE = 250
+
+def json_default(value: Any) -> str:
+    """Serializa datetimes en ISO-8601 (como orjson) y el resto de tipos como texto"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+def dump_tool_result(result: Dict[str, Any]) -> str:
+    """Serializa la respuesta de una herramienta una sola vez, en JSON compacto (datetimes en ISO-8601)"""
+    if orjson:
+        return orjson.dumps(result, default=str).decode()
+    # Respaldo sin orjson (plataformas sin wheel)
+    return json.dumps(result, ensure_ascii=False, separators=(',', ':'), default=json_default)
+
+# Hilos dedicados a las herramientas (independientes del pool por defecto de anyio, 40 hilos)
+WORKER_THREADS = int(os.getenv('SITEWISE_WORKER_THREADS', '64'))
+_worker_limiter = None
+
+def get_worker_limiter() -> anyio.CapacityLimiter:
+    """Crea el limitador de hilos dentro del event loop en el primer uso"""
+    global _worker_limiter
+    if _worker_limiter is None:
+        _worker_limiter = anyio.CapacityLimiter(WORKER_THREADS)
+    return _worker_limiter
+
+def run_in_worker_thread(func=None, *, requires_client: bool = True):
+    """Ejecuta una herramienta síncrona (boto3) en un hilo de trabajo sin bloquear el event loop de MCP
+    
+    requires_client=False omite la comprobación del cliente (herramientas que solo usan estado local)
+    """
+    if func is None:
+        return functools.partial(run_in_worker_thread, requires_client=requires_client)
+    
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        def run_tool():
+            # Comprobación única del cliente para todas las herramientas (se crea aquí, fuera del event loop)
+            if requires_client and not get_sitewise_client():
+                return dump_tool_result({
+                    "success": False,
+                    "error": "Cliente SiteWise no disponible. Configurar credenciales AWS en .env"
+                })
+            return dump_tool_result(func(*args, **kwargs))
+        return await anyio.to_thread.run_sync(run_tool, limiter=get_worker_limiter())
+    return wrapper
+
 # Función para configurar credenciales AWS
 def configure_aws_credentials():
     """Configura las credenciales de AWS desde variables de entorno"""
@@ -54,193 +129,428 @@ def configure_aws_credentials():
     
     return aws_config
 
-# Inicializar cliente SiteWise
-sitewise = None
-try:
-    # Configurar credenciales
-    aws_config = configure_aws_credentials()
-    
-    # Verificar credenciales con STS
-    sts = boto3.client('sts', **aws_config)
-    identity = sts.get_caller_identity()
-    logger.info(f"AWS Identity: {identity.get('Arn', 'Unknown')}")
-    logger.info(f"Account: {identity.get('Account', 'Unknown')}")
-    logger.info(f"Region: {aws_config.get('region_name', 'default')}")
+# Configuración del cliente SiteWise: pool de conexiones amplio y keepalive para las llamadas
+# concurrentes, reintentos adaptativos (backoff ante throttling) y timeouts cortos.
+# La validación de parámetros de botocore sigue activa (rechaza localmente, p. ej., IDs vacíos
+# o con longitud inválida); SITEWISE_PARAM_VALIDATION=0 la desactiva. Las herramientas además
+# comprueban max_results/count, tipos de agregado y resolución antes de llamar a SiteWise
+SITEWISE_CLIENT_CONFIG = Config(
+    max_pool_connections=64,
+    tcp_keepalive=True,
+    retries={'max_attempts': 5, 'mode': 'adaptive'},
+    connect_timeout=3,
+    read_timeout=10,
+    parameter_validation=os.getenv('SITEWISE_PARAM_VALIDATION', '1') != '0'
+)
+
+# Cliente SiteWise: se crea en la primera llamada a una herramienta (no en la importación)
+_sitewise = None
+_sitewise_lock = threading.Lock()
+
+def create_sitewise_client():
+    """Crea el cliente SiteWise; devuelve None si las credenciales no son válidas"""
+    try:
+        # Configurar credenciales
+        aws_config = configure_aws_credentials()
+        
+        # Verificar credenciales con STS (opcional: añade una llamada AWS al arranque)
+        if os.getenv('SITEWISE_VERIFY_STS') == '1':
+            sts = boto3.client('sts', **aws_config)
+            identity = sts.get_caller_identity()
+            logger.info(f"AWS Identity: {identity.get('Arn', 'Unknown')}")
+            logger.info(f"Account: {identity.get('Account', 'Unknown')}")
+        logger.info(f"Region: {aws_config.get('region_name', 'default')}")
+        
+        # Crear cliente SiteWise
+        client = boto3.client('iotsitewise', config=SITEWISE_CLIENT_CONFIG, **aws_config)
+        logger.info("Cliente SiteWise inicializado correctamente")
+        return client
+        
+    except NoCredentialsError:
+        logger.error("❌ Credenciales AWS no configuradas")
+        logger.error("💡 Configura AWS_ACCESS_KEY_ID y AWS_SECRET_ACCESS_KEY en .env")
+    except ClientError as e:
+        logger.error(f"❌ Error AWS: {e.response['Error']['Message']}")
+        logger.error("💡 Verifica que las credenciales sean válidas y tengan permisos para SiteWise")
+    except Exception as e:
+        logger.error(f"❌ Error inicializando SiteWise: {str(e)}")
+    return None
+
+def get_sitewise_client():
+    """Devuelve el cliente SiteWise compartido, creándolo en el primer uso"""
+    global _sitewise
+    if _sitewise is None:
+        # Doble comprobación: llamadas concurrentes (o el precalentamiento) crean un solo cliente
+        with _sitewise_lock:
+            if _sitewise is None:
+                _sitewise = create_sitewise_client()
+    return _sitewise
+
+def warm_sitewise_client() -> None:
+    """Crea el cliente y hace una primera llamada (endpoint, modelo de servicio y conexión TLS listos)"""
+    try:
+        if not get_sitewise_client():
+            logger.warning("⚠️  Servidor sin conexión SiteWise - verificar credenciales")
+            return
+        # Primera llamada real: boto3 no comprueba las credenciales al crear el cliente.
+        # La lista de modelos queda además en caché para la primera consulta de jerarquía
+        cached_list_asset_models()
+        logger.info("✅ Servidor listo para conexiones MCP")
+    except NoCredentialsError:
+        logger.error("❌ Credenciales AWS no configuradas")
+        logger.error("💡 Configura AWS_ACCESS_KEY_ID y AWS_SECRET_ACCESS_KEY en .env")
+        logger.warning("⚠️  Servidor sin conexión SiteWise - verificar credenciales")
+    except ClientError as e:
+        logger.error(f"❌ Error AWS: {e.response['Error']['Message']}")
+        logger.error("💡 Verifica que las credenciales sean válidas y tengan permisos para SiteWise")
+        logger.warning("⚠️  Servidor sin conexión SiteWise - verificar credenciales")
+    except Exception as e:
+        logger.warning("No se pudo precalentar el cliente SiteWise: %s", e)
+
+
+# Caché TTL de metadatos (activos y modelos cambian poco comparados con la telemetría)
+METADATA_CACHE_TTL = int(os.getenv('SITEWISE_METADATA_TTL', '600'))
+_describe_asset_cache = TTLCache(maxsize=2048, ttl=METADATA_CACHE_TTL)
+_asset_models_cache = TTLCache(maxsize=1, ttl=METADATA_CACHE_TTL)
+# alias -> (assetId, propertyId), aprendido de describe_asset para no resolver el alias en SiteWise
+_alias_ids_cache = TTLCache(maxsize=8192, ttl=METADATA_CACHE_TTL)
+_cache_lock = threading.Lock()
+
+# Caché TTL de respuestas completas de herramientas consultadas repetidamente por los agentes
+_hierarchy_cache = TTLCache(maxsize=8, ttl=int(os.getenv('SITEWISE_HIERARCHY_TTL', '60')))
+_latest_values_cache = TTLCache(maxsize=1024, ttl=int(os.getenv('SITEWISE_LATEST_TTL', '5')))
+
+def get_cached_result(cache: TTLCache, key) -> Optional[Dict[str, Any]]:
+    with _cache_lock:
+        return cache.get(key)
+
+def store_result(cache: TTLCache, key, result: Dict[str, Any]) -> Dict[str, Any]:
+    """Guarda una respuesta exitosa (nunca se modifica después: se serializa al devolverla)"""
+    with _cache_lock:
+        cache[key] = result
+    return result
+
+def cached_describe_asset(asset_id: str, refresh: bool = False) -> Dict[str, Any]:
+    """describe_asset con caché TTL por asset_id (refresh fuerza la consulta a SiteWise)"""
+    with _cache_lock:
+        response = None if refresh else _describe_asset_cache.get(asset_id)
+    if response is None:
+        response = get_sitewise_client().describe_asset(assetId=asset_id)
+        with _cache_lock:
+            _describe_asset_cache[asset_id] = response
+            for prop in response.get('assetProperties', []):
+                if prop.get('alias'):
+                    _alias_ids_cache[prop['alias']] = (asset_id, prop['id'])
+    return response
+
+def cached_list_asset_models(refresh: bool = False) -> List[Dict[str, Any]]:
+    """Lista todos los modelos de activos (todas las páginas) con caché TTL"""
+    with _cache_lock:
+        models = None if refresh else _asset_models_cache.get('models')
+    if models is None:
+        paginator = get_sitewise_client().get_paginator('list_asset_models')
+        # search() recorre los elementos de todas las páginas sin el bucle por página
+        models = list(paginator.paginate(PaginationConfig={'PageSize': MAX_PAGE_SIZE}).search('assetModelSummaries[]'))
+        with _cache_lock:
+            _asset_models_cache['models'] = models
+    return models
+
+
+
+
+_now_iso_cached = (0, '')
+
+def now_iso() -> str:
+    """Marca de tiempo local ISO 8601 con resolución de 1 segundo, formateada una vez por segundo"""
+    global _now_iso_cached
+    now = int(time.time())
+    cached_second, cached_iso = _now_iso_cached
+    if now != cached_second:
+        cached_iso = datetime.fromtimestamp(now).isoformat()
+        _now_iso_cached = (now, cached_iso)
+    return cached_iso
+
+@functools.lru_cache(maxsize=1024)
+def iso_to_unix(value: str) -> int:
+    """Convierte una fecha ISO 8601 a segundos Unix (cacheado: los clientes repiten las mismas ventanas)"""
+    return int(parse_datetime(value).timestamp())
+
+# Campos de cada propiedad devueltos por la jerarquía y get_asset_properties
+PROPERTY_KEYS = ('id', 'name', 'alias', 'dataType', 'unit', 'dataTypeSpec')
+
+def format_values(values: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Proyecta los puntos de historial de SiteWise a {value, timestamp, quality}"""
+    # value y timestamp son obligatorios en AssetPropertyValue; quality es opcional
+    return [
+        {"value": value['value'], "timestamp": value['timestamp'], "quality": value.get('quality')}
+        for value in values
+    ]
+
+def format_values_soa(values: List[Dict[str, Any]]) -> Dict[str, List[Any]]:
+    """Proyecta los puntos de historial en columnas {values, timestamps, qualities} (sin repetir claves)"""
+    return {
+        "values": [value['value'] for value in values],
+        "timestamps": [value['timestamp'] for value in values],
+        "qualities": [value.get('quality') for value in values]
+    }
+
+def resolve_property_target(
+    property_alias: Optional[str],
+    asset_id: Optional[str],
+    property_id: Optional[str]
+) -> Dict[str, str]:
+    """Parámetros que identifican la propiedad en SiteWise: propertyAlias O (assetId + propertyId)"""
+    if property_alias:
+        return {'propertyAlias': property_alias}
+    if asset_id and property_id:
+        return {'assetId': asset_id, 'propertyId': property_id}
+    raise ValueError("Debe proporcionar property_alias O (asset_id + property_id)")
+
+# Concurrencia de la paginación de activos por modelo
+MODEL_LIST_CONCURRENCY = int(os.getenv('SITEWISE_LIST_CONCURRENCY', '8'))
+
+def list_assets_for_model(asset_paginator, model: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Pagina todos los activos de un modelo (se ejecuta en el pool de hilos)"""
+    assets = asset_paginator.paginate(
+        assetModelId=model['id'],
+        PaginationConfig={'PageSize': MAX_PAGE_SIZE}
+    ).search('assetSummaries[]')
+    return [
+        {
+            "id": asset['id'],
+            "name": asset['name'],
+            "model_name": model['name'],
+            "model_id": model['id'],
+            # arn, fechas y estado son obligatorios en AssetSummary: acceso directo sin valores por defecto
+            "arn": asset['arn'],
+            # Datetimes sin formatear: orjson los serializa en ISO-8601
+            "creation_date": asset['creationDate'],
+            "last_update": asset['lastUpdateDate'],
+            "status": asset['status']['state'],
+            "properties": []
+        }
+        for asset in assets
+    ]
+
+# Concurrencia del fan-out por activo (hijos + propiedades) en list_all_assets_hierarchy
+ASSET_FETCH_CONCURRENCY = int(os.getenv('SITEWISE_CONCURRENCY', '24'))
+
+def fetch_asset_relations(children_paginator, asset_id: str, include_properties: bool, refresh: bool):
+    """Obtiene los hijos directos y, opcionalmente, las propiedades de un activo (se ejecuta en el pool de hilos)"""
+    # Paginar: una sola llamada devuelve como máximo una página de hijos
+    children_summaries = list(children_paginator.paginate(
+        assetId=asset_id,
+        traversalDirection='CHILD',
+        PaginationConfig={'PageSize': MAX_PAGE_SIZE}
+    ).search('assetSummaries[]'))
     
-    # Crear cliente SiteWise
-    sitewise = boto3.client('iotsitewise', **aws_config)
-    logger.info("Cliente SiteWise inicializado correctamente")
+    properties = []
+    if include_properties:
+        try:
+            properties = cached_describe_asset(asset_id, refresh).get('assetProperties', [])
+        except Exception as e:
+            logger.warning("Error obteniendo propiedades para %s: %s", asset_id, e)
     
-except NoCredentialsError:
-    logger.error("❌ Credenciales AWS no configuradas")
-    logger.error("💡 Configura AWS_ACCESS_KEY_ID y AWS_SECRET_ACCESS_KEY en .env")
-except ClientError as e:
-    logger.error(f"❌ Error AWS: {e.response['Error']['Message']}")
-    logger.error("💡 Verifica que las credenciales sean válidas y tengan permisos para SiteWise")
-except Exception as e:
-    logger.error(f"❌ Error inicializando SiteWise: {str(e)}")
+    return children_summaries, properties
 
+# Caché TTL del grafo plano de activos (compartido por la jerarquía completa y la paginada)
+_asset_graph_cache = TTLCache(maxsize=2, ttl=int(os.getenv('SITEWISE_HIERARCHY_TTL', '60')))
 
+def fetch_asset_graph(include_properties: bool, refresh: bool) -> Dict[str, Any]:
+    """Obtiene todos los activos y sus relaciones padre → hijos (con caché TTL)"""
+    if not refresh:
+        cached = get_cached_result(_asset_graph_cache, include_properties)
+        if cached is not None:
+            return cached
+    
+    # Obtener todos los activos
+    logger.info("Obteniendo todos los activos...")
+    models = cached_list_asset_models(refresh)
+    
+    assets_dict = {}
+    models_info = {}
+    
+    for model in models:
+        models_info[model['id']] = {
+            "name": model['name'],
+            "description": model.get('description', ''),
+            "creation_date": model.get('creationDate', '')
+        }
+    
+    # Paginadores creados una sola vez y compartidos por los hilos (paginate() no guarda estado)
+    client = get_sitewise_client()
+    asset_paginator = client.get_paginator('list_assets')
+    children_paginator = client.get_paginator('list_associated_assets')
+    
+    # Paginar los activos de cada modelo en paralelo
+    # Sin hilos ociosos cuando hay menos modelos (o activos) que trabajadores
+    with ThreadPoolExecutor(max_workers=max(1, min(MODEL_LIST_CONCURRENCY, len(models)))) as executor:
+        submit = executor.submit
+        futures = [(model, submit(list_assets_for_model, asset_paginator, model)) for model in models]
+        # Recorrer en orden de modelo para mantener un resultado determinista
+        for model, future in futures:
+            try:
+                for asset in future.result():
+                    assets_dict[asset['id']] = asset
+            except Exception as e:
+                logger.warning("Error con modelo %s: %s", model['id'], e)
+                continue
+    
+    # Obtener asociaciones y propiedades de todos los activos en paralelo
+    children_by_parent = {}
+    parent_of = {}
+    
+    with ThreadPoolExecutor(max_workers=max(1, min(ASSET_FETCH_CONCURRENCY, len(assets_dict)))) as executor:
+        submit = executor.submit
+        futures = {
+            submit(fetch_asset_relations, children_paginator, asset['id'], include_properties, refresh): asset
+            for asset in assets_dict.values()
+        }
+        for future in as_completed(futures):
+            asset = futures[future]
+            try:
+                children_summaries, properties = future.result()
+            except Exception as e:
+                logger.warning("Error obteniendo asociaciones para %s: %s", asset['id'], e)
+                continue
+            
+            # Solo ids: los datos del hijo se leen de assets_dict al construir el árbol
+            children_ids = [child['id'] for child in children_summaries if child['id'] in assets_dict]
+            if children_ids:
+                children_by_parent[asset['id']] = children_ids
+                for child_id in children_ids:
+                    parent_of[child_id] = asset['id']
+            
+            asset['properties'] = [{key: prop.get(key) for key in PROPERTY_KEYS} for prop in properties]
+    
+    return store_result(_asset_graph_cache, include_properties, {
+        "assets": assets_dict,
+        "children_by_parent": children_by_parent,
+        # Raíces: activos sin padre que tengan hijos, en orden de modelo
+        "root_ids": [
+            asset_id for asset_id in assets_dict
+            if asset_id not in parent_of and asset_id in children_by_parent
+        ],
+        "models_info": models_info
+    })
 
+def iter_hierarchy_trees(graph: Dict[str, Any], root_ids: List[str]):
+    """Genera (árbol, número de activos) por cada raíz, construyendo cada árbol solo al pedirlo"""
+    assets_dict = graph['assets']
+    children_by_parent = graph['children_by_parent']
+    
+    def build_asset_node(asset, level, children_ids):
+        return {
+            "id": asset['id'],
+            "name": asset['name'],
+            "model_name": asset['model_name'],
+            "model_id": asset['model_id'],
+            "level": level,
+            "status": asset['status'],
+            "creation_date": asset['creation_date'],
+            "last_update": asset['last_update'],
+            "arn": asset['arn'],
+            "properties_count": len(asset['properties']),
+            # Misma lista ya formateada en el fan-out (solo se lee al serializar)
+            "properties": asset['properties'],
+            "children_names": [assets_dict[child_id]['name'] for child_id in children_ids],
+            "children_count": len(children_ids),
+            "children": []
+        }
+    
+    # Recorrido BFS por raíz: cada nodo se añade a la lista 'children'
+    # que su padre creó al salir de la cola
+    for root_id in root_ids:
+        tree = []
+        node_count = 0
+        queue = deque([(root_id, 0, tree)])
+        while queue:
+            asset_id, level, parent_children = queue.popleft()
+            children_ids = children_by_parent.get(asset_id, ())
+            node = build_asset_node(assets_dict[asset_id], level, children_ids)
+            parent_children.append(node)
+            node_count += 1
+            for child_id in children_ids:
+                queue.append((child_id, level + 1, node['children']))
+        yield tree[0], node_count
 
-@mcp.tool()
-def list_all_assets_hierarchy() -> Dict[str, Any]:
+@mcp.tool(structured_output=False)
+@run_in_worker_thread
+def list_all_assets_hierarchy(
+    include_properties: bool = False,
+    refresh: bool = False,
+    max_assets: Optional[int] = None
+) -> Dict[str, Any]:
     """
     Obtiene todos los activos organizados en jerarquía: principales → hijos → nietos.
     
+    Por defecto no incluye las propiedades de cada activo; usar get_asset_properties(asset_id)
+    para los activos de interés o pasar include_properties=True. Para cuentas grandes,
+    list_hierarchy_page devuelve las jerarquías principales por páginas.
+    
+    Args:
+        include_properties: Incluir las propiedades de cada activo (una llamada extra por activo)
+        refresh: Ignorar la caché (60s por defecto) y volver a consultar SiteWise
+        max_assets: Límite de activos en la respuesta (solo jerarquías completas; continuar
+            con list_hierarchy_page desde next_offset)
+    
     Returns:
         Dict con todos los activos organizados por niveles jerárquicos
     """
-    if not sitewise:
+    if max_assets is not None and max_assets < 1:
         return {
             "success": False,
-            "error": "Cliente SiteWise no disponible. Configurar credenciales AWS en .env"
+            "error": "max_assets debe ser >= 1"
         }
     
+    cache_key = (include_properties, max_assets)
+    if not refresh:
+        cached = get_cached_result(_hierarchy_cache, cache_key)
+        if cached is not None:
+            return cached
+    
     try:
-        all_assets = []
-        models_info = {}
-        
-        # Obtener todos los activos
-        logger.info("Obteniendo todos los activos...")
-        paginator = sitewise.get_paginator('list_asset_models')
-        for page in paginator.paginate(maxResults=50):
-            models = page.get('assetModelSummaries', [])
-            
-            for model in models:
-                models_info[model['id']] = {
-                    "name": model['name'],
-                    "description": model.get('description', ''),
-                    "creation_date": model.get('creationDate', '').isoformat() if model.get('creationDate') else ''
-                }
-                
-                try:
-                    asset_paginator = sitewise.get_paginator('list_assets')
-                    for asset_page in asset_paginator.paginate(
-                        assetModelId=model['id'],
-                        maxResults=100
-                    ):
-                        for asset in asset_page.get('assetSummaries', []):
-                            asset_info = {
-                                "id": asset['id'],
-                                "name": asset['name'],
-                                "model_name": model['name'],
-                                "model_id": model['id'],
-                                "arn": asset.get('arn', ''),
-                                "creation_date": asset.get('creationDate', '').isoformat() if asset.get('creationDate') else '',
-                                "last_update": asset.get('lastUpdateDate', '').isoformat() if asset.get('lastUpdateDate') else '',
-                                "status": asset.get('status', {}).get('state', 'UNKNOWN'),
-                                "children": [],
-                                "parent_id": None,
-                                "properties": []
-                            }
-                            all_assets.append(asset_info)
-                            
-                except Exception as e:
-                    logger.warning(f"Error con modelo {model['id']}: {e}")
-                    continue
-        
-        if not all_assets:
+        graph = fetch_asset_graph(include_properties, refresh)
+        if not graph['assets']:
             return {
                 "success": True,
                 "structured_data": [],
                 "message": "No se encontraron activos"
             }
         
-        # Obtener asociaciones y propiedades para cada activo
-        assets_dict = {asset['id']: asset for asset in all_assets}
-        
-        for asset in all_assets:
-            try:
-                # Obtener hijos
-                children_response = sitewise.list_associated_assets(
-                    assetId=asset['id'],
-                    traversalDirection='CHILD'
-                )
-                
-                for child_summary in children_response.get('assetSummaries', []):
-                    child_id = child_summary['id']
-                    if child_id in assets_dict:
-                        child_asset = assets_dict[child_id]
-                        child_asset['parent_id'] = asset['id']
-                        asset['children'].append({
-                            "id": child_id,
-                            "name": child_summary['name'],
-                            "model_name": assets_dict[child_id]['model_name']
-                        })
-                
-                # Obtener propiedades básicas
-                try:
-                    asset_details = sitewise.describe_asset(assetId=asset['id'])
-                    properties = asset_details.get('assetProperties', [])
-                    
-                    for prop in properties:
-                        asset['properties'].append({
-                            "id": prop.get('id'),
-                            "name": prop.get('name'),
-                            "alias": prop.get('alias'),
-                            "dataType": prop.get('dataType'),
-                            "unit": prop.get('unit'),
-                            "dataTypeSpec": prop.get('dataTypeSpec')
-                        })
-                except Exception as e:
-                    logger.warning(f"Error obteniendo propiedades para {asset['id']}: {e}")
-                
-            except Exception as e:
-                logger.warning(f"Error obteniendo asociaciones para {asset['id']}: {e}")
-                continue
-        
-        # Identificar activos raíz (sin padres)
-        root_assets = [asset for asset in all_assets if asset['parent_id'] is None]
-        
-        # Crear estructura jerarquizada
-        def build_hierarchy_structure(asset_id, level=0):
-            asset = assets_dict[asset_id]
-            
-            structure = {
-                "id": asset['id'],
-                "name": asset['name'],
-                "model_name": asset['model_name'],
-                "model_id": asset['model_id'],
-                "level": level,
-                "status": asset['status'],
-                "creation_date": asset['creation_date'],
-                "last_update": asset['last_update'],
-                "arn": asset['arn'],
-                "properties_count": len(asset['properties']),
-                "properties": [
-                    {
-                        "id": prop['id'],
-                        "name": prop['name'],
-                        "alias": prop['alias'],
-                        "dataType": prop['dataType'],
-                        "unit": prop['unit'],
-                        "dataTypeSpec": prop['dataTypeSpec']
-                    } for prop in asset['properties']
-                ],
-                "children_names": [child['name'] for child in asset['children']],
-                "children_count": len(asset['children']),
-                "children": []
-            }
-            
-            # Procesar hijos recursivamente
-            for child in asset['children']:
-                structure['children'].append(build_hierarchy_structure(child['id'], level + 1))
-            
-            return structure
-        
-        # Construir jerarquía completa
+        # Los árboles se generan uno a uno: con max_assets se deja de construir al llegar al límite
         hierarchy_structure = []
-        for root in root_assets:
-            if root['children']:  # Solo incluir raíces que tengan hijos
-                hierarchy_structure.append(build_hierarchy_structure(root['id']))
+        included_assets = 0
+        for tree, node_count in iter_hierarchy_trees(graph, graph['root_ids']):
+            if max_assets is not None and included_assets + node_count > max_assets:
+                break
+            hierarchy_structure.append(tree)
+            included_assets += node_count
         
-        return {
+        # Conteos del resumen calculados una sola vez
+        roots_count = len(hierarchy_structure)
+        total_roots = len(graph['root_ids'])
+        truncated = roots_count < total_roots
+        if truncated:
+            # Con max_assets el resumen cuenta solo los activos incluidos en la respuesta
+            message = (
+                f"Jerarquía obtenida: {included_assets} de {len(graph['assets'])} activos, "
+                f"{roots_count} de {total_roots} jerarquías principales"
+            )
+        else:
+            message = f"Jerarquía obtenida: {len(graph['assets'])} activos, {roots_count} jerarquías principales"
+        result = {
             "success": True,
             "structured_data": hierarchy_structure,
-            "models_info": models_info,
-            "message": f"Jerarquía obtenida: {len(all_assets)} activos, {len(hierarchy_structure)} jerarquías principales"
+            "models_info": graph['models_info'],
+            "message": message
         }
+        if max_assets is not None:
+            result.update({
+                "truncated": truncated,
+                "next_offset": roots_count if truncated else None
+            })
+        return store_result(_hierarchy_cache, cache_key, result)
         
     except ClientError as e:
         return {
@@ -253,39 +563,80 @@ def list_all_assets_hierarchy() -> Dict[str, Any]:
             "error": f"Error obteniendo jerarquía formateada: {str(e)}"
         }
 
-@mcp.tool()
-def get_asset_properties(asset_id: str) -> Dict[str, Any]:
+@mcp.tool(structured_output=False)
+@run_in_worker_thread
+def list_hierarchy_page(
+    offset: int = 0,
+    limit: int = 1,
+    include_properties: bool = False,
+    refresh: bool = False
+) -> Dict[str, Any]:
     """
-    Obtiene todas las propiedades medibles de un activo específico.
+    Obtiene una página de jerarquías principales (solo construye los árboles solicitados).
     
     Args:
-        asset_id: ID del activo
+        offset: Índice de la primera jerarquía principal
+        limit: Número de jerarquías principales a devolver
+        include_properties: Incluir las propiedades de cada activo (una llamada extra por activo)
+        refresh: Ignorar la caché (60s por defecto) y volver a consultar SiteWise
     
     Returns:
-        Dict con las propiedades del activo
+        Dict con las jerarquías de la página y el offset de la siguiente
     """
-    if not sitewise:
+    if offset < 0 or limit < 1:
         return {
             "success": False,
-            "error": "Cliente SiteWise no disponible"
+            "error": "offset debe ser >= 0 y limit >= 1"
         }
     
     try:
-        response = sitewise.describe_asset(assetId=asset_id)
+        graph = fetch_asset_graph(include_properties, refresh)
+        root_ids = graph['root_ids']
+        page_root_ids = root_ids[offset:offset + limit]
+        next_offset = offset + len(page_root_ids)
+        
+        return {
+            "success": True,
+            "structured_data": [tree for tree, _ in iter_hierarchy_trees(graph, page_root_ids)],
+            "models_info": graph['models_info'],
+            "offset": offset,
+            "total_roots": len(root_ids),
+            "next_offset": next_offset if next_offset < len(root_ids) else None,
+            "hasMore": next_offset < len(root_ids)
+        }
+        
+    except ClientError as e:
+        return {
+            "success": False,
+            "error": f"Error AWS: {e.response['Error']['Message']}"
+        }
+    except Exception as e:
+        return {
+            "success": False,
+            "error": f"Error obteniendo página de jerarquía: {str(e)}"
+        }
+
+@mcp.tool(structured_output=False)
+@run_in_worker_thread
+def get_asset_properties(asset_id: str, refresh: bool = False) -> Dict[str, Any]:
+    """
+    Obtiene todas las propiedades medibles de un activo específico.
+    
+    Args:
+        asset_id: ID del activo
+        refresh: Ignorar la caché de metadatos y volver a consultar SiteWise
+    
+    Returns:
+        Dict con las propiedades del activo
+    """
+    try:
+        response = cached_describe_asset(asset_id, refresh)
         properties = response.get('assetProperties', [])
         
-        formatted_properties = []
-        for prop in properties:
-            prop_info = {
-                "id": prop.get('id'),
-                "name": prop.get('name'),
-                "alias": prop.get('alias'),
-                "dataType": prop.get('dataType'),
-                "unit": prop.get('unit'),
-                "dataTypeSpec": prop.get('dataTypeSpec'),
-                "notification": prop.get('notification', {})
-            }
-            formatted_properties.append(prop_info)
+        formatted_properties = [
+            {**{key: prop.get(key) for key in PROPERTY_KEYS}, "notification": prop.get('notification', {})}
+            for prop in properties
+        ]
         
         return {
             "success": True,
@@ -312,7 +663,8 @@ def get_asset_properties(asset_id: str) -> Dict[str, Any]:
             "error": f"Error obteniendo propiedades: {str(e)}"
         }
 
-@mcp.tool()
+@mcp.tool(structured_output=False)
+@run_in_worker_thread
 def get_current_value(
     property_alias: Optional[str] = None, 
     asset_id: Optional[str] = None, 
@@ -329,28 +681,37 @@ def get_current_value(
     Returns:
         Dict con el valor actual de la propiedad
     """
-    if not sitewise:
+    try:
+        target = resolve_property_target(property_alias, asset_id, property_id)
+    except ValueError as e:
         return {
             "success": False,
-            "error": "Cliente SiteWise no disponible"
+            "error": str(e)
         }
     
+    if 'propertyAlias' in target:
+        # Alias ya conocido: se consulta por IDs (y se agrupa con las demás lecturas por IDs)
+        ids = get_cached_result(_alias_ids_cache, property_alias)
+        if ids:
+            target = {'assetId': ids[0], 'propertyId': ids[1]}
+    
     try:
-        params = {}
-        
-        if property_alias:
-            params['propertyAlias'] = property_alias
-        elif asset_id and property_id:
-            params['assetId'] = asset_id
-            params['propertyId'] = property_id
+        if BATCH_WINDOW_MS > 0:
+            # Lecturas concurrentes se agrupan en una sola llamada BatchGetAssetPropertyValue
+            property_value = current_value_batcher.get(target)
+            if not property_value.get('success'):
+                if property_value.get('error_code') == 'ResourceNotFoundException':
+                    return {
+                        "success": False,
+                        "error": "Propiedad no encontrada o sin datos"
+                    }
+                return {
+                    "success": False,
+                    "error": f"Error AWS: {property_value.get('error')}"
+                }
         else:
-            return {
-                "success": False,
-                "error": "Debe proporcionar property_alias O (asset_id + property_id)"
-            }
-        
-        response = sitewise.get_asset_property_value(**params)
-        property_value = response.get('propertyValue', {})
+            response = get_sitewise_client().get_asset_property_value(**target)
+            property_value = response.get('propertyValue', {})
         
         return {
             "success": True,
@@ -360,7 +721,7 @@ def get_current_value(
             "value": property_value.get('value'),
             "timestamp": property_value.get('timestamp'),
             "quality": property_value.get('quality'),
-            "retrieved_at": datetime.now().isoformat()
+            "retrieved_at": now_iso()
         }
         
     except ClientError as e:
@@ -379,18 +740,25 @@ def get_current_value(
             "error": f"Error obteniendo valor actual: {str(e)}"
         }
 
-@mcp.tool()
+@mcp.tool(structured_output=False)
+@run_in_worker_thread
 def get_historical_data(
     start_date: str, 
     end_date: str,
     property_alias: Optional[str] = None, 
     asset_id: Optional[str] = None, 
     property_id: Optional[str] = None,
-    max_results: int = 100
+    max_results: int = 100,
+    next_token: Optional[str] = None,
+    layout: str = 'records'
 ) -> Dict[str, Any]:
     """
     Obtiene valores históricos de una propiedad en un rango de tiempo.
     
+    Para rangos grandes, pedir páginas moderadas y continuar con el nextToken
+    devuelto en lugar de solicitar todos los valores en una sola respuesta;
+    layout='soa' reduce el tamaño de la respuesta.
+    
     Args:
         start_date: Fecha de inicio (ISO 8601: 2024-01-01T00:00:00Z)
         end_date: Fecha de fin (ISO 8601: 2024-01-02T00:00:00Z)
@@ -398,48 +766,50 @@ def get_historical_data(
         asset_id: ID del activo (alternativa al alias)
         property_id: ID de la propiedad (usado con asset_id)
         max_results: Máximo número de valores (default: 100)
+        next_token: Token de la respuesta anterior para obtener la siguiente página
+        layout: 'records' (lista de {value, timestamp, quality}) o 'soa' (listas por columna)
     
     Returns:
         Dict con los valores históricos de la propiedad
     """
-    if not sitewise:
+    if layout not in ('records', 'soa'):
+        return {
+            "success": False,
+            "error": "layout debe ser 'records' o 'soa'"
+        }
+    if max_results < 1:
         return {
             "success": False,
-            "error": "Cliente SiteWise no disponible"
+            "error": "max_results debe ser >= 1"
         }
     
     try:
-        start_dt = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
-        end_dt = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
-        
-        params = {
-            'startDate': int(start_dt.timestamp()),
-            'endDate': int(end_dt.timestamp()),
-            'maxResults': min(max_results, 20000),
-            'timeOrdering': 'ASCENDING'
+        target = resolve_property_target(property_alias, asset_id, property_id)
+    except ValueError as e:
+        return {
+            "success": False,
+            "error": str(e)
         }
+    
+    try:
+        # El paginador sigue pidiendo páginas hasta reunir exactamente max_results valores
+        # (SiteWise puede devolver menos por página) y devuelve el token para continuar
+        max_results = min(max_results, 20000)
+        pagination_config = {'MaxItems': max_results, 'PageSize': max_results}
+        if next_token:
+            pagination_config['StartingToken'] = next_token
         
-        if property_alias:
-            params['propertyAlias'] = property_alias
-        elif asset_id and property_id:
-            params['assetId'] = asset_id
-            params['propertyId'] = property_id
-        else:
-            return {
-                "success": False,
-                "error": "Debe proporcionar property_alias O (asset_id + property_id)"
-            }
-        
-        response = sitewise.get_asset_property_value_history(**params)
+        paginator = get_sitewise_client().get_paginator('get_asset_property_value_history')
+        response = paginator.paginate(
+            **target,
+            startDate=iso_to_unix(start_date),
+            endDate=iso_to_unix(end_date),
+            timeOrdering='ASCENDING',
+            PaginationConfig=pagination_config
+        ).build_full_result()
         values = response.get('assetPropertyValueHistory', [])
         
-        formatted_values = []
-        for value in values:
-            formatted_values.append({
-                "value": value.get('value'),
-                "timestamp": value.get('timestamp'),
-                "quality": value.get('quality')
-            })
+        formatted_values = format_values_soa(values) if layout == 'soa' else format_values(values)
         
         return {
             "success": True,
@@ -448,10 +818,11 @@ def get_historical_data(
             "property_id": property_id,
             "start_date": start_date,
             "end_date": end_date,
+            "layout": layout,
             "values": formatted_values,
-            "count": len(formatted_values),
-            "nextToken": response.get('nextToken'),
-            "hasMore": 'nextToken' in response
+            "count": len(values),
+            "nextToken": response.get('NextToken'),
+            "hasMore": 'NextToken' in response
         }
         
     except ValueError as e:
@@ -470,7 +841,12 @@ def get_historical_data(
             "error": f"Error obteniendo historial: {str(e)}"
         }
 
-@mcp.tool()
+# Ventanas sucesivas de get_latest_values en segundos (la más amplia es la de 24h)
+LATEST_VALUES_MAX_WINDOW = 24 * 3600
+LATEST_VALUES_WINDOWS = (3600, 6 * 3600, LATEST_VALUES_MAX_WINDOW)
+
+@mcp.tool(structured_output=False)
+@run_in_worker_thread
 def get_latest_values(
     property_alias: Optional[str] = None, 
     asset_id: Optional[str] = None, 
@@ -489,46 +865,50 @@ def get_latest_values(
     Returns:
         Dict con los últimos valores de la propiedad
     """
-    if not sitewise:
+    if count < 1:
+        return {
+            "success": False,
+            "error": "count debe ser >= 1"
+        }
+    
+    cache_key = (property_alias, asset_id, property_id, count)
+    cached = get_cached_result(_latest_values_cache, cache_key)
+    if cached is not None:
+        return cached
+    
+    try:
+        target = resolve_property_target(property_alias, asset_id, property_id)
+    except ValueError as e:
         return {
             "success": False,
-            "error": "Cliente SiteWise no disponible"
+            "error": str(e)
         }
     
     try:
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=1)
+        # Ventana adaptativa: empezar por los últimos max(5, count) minutos y ampliar
+        # (1h, 6h, 24h) solo si no hay suficientes valores; como máximo 4 llamadas
+        end_ts = int(time.time())
+        first_window = min(max(5, count) * 60, LATEST_VALUES_MAX_WINDOW)
+        windows = [first_window] + [window for window in LATEST_VALUES_WINDOWS if window > first_window]
         
         params = {
-            'startDate': int(start_date.timestamp()),
-            'endDate': int(end_date.timestamp()),
+            **target,
+            'endDate': end_ts,
             'maxResults': min(count, 20000),
             'timeOrdering': 'DESCENDING'
         }
+        for window in windows:
+            start_ts = end_ts - window
+            params['startDate'] = start_ts
+            response = get_sitewise_client().get_asset_property_value_history(**params)
+            values = response.get('assetPropertyValueHistory', [])
+            # Con nextToken ya hay al menos maxResults valores en la ventana
+            if len(values) >= count or 'nextToken' in response:
+                break
         
-        if property_alias:
-            params['propertyAlias'] = property_alias
-        elif asset_id and property_id:
-            params['assetId'] = asset_id
-            params['propertyId'] = property_id
-        else:
-            return {
-                "success": False,
-                "error": "Debe proporcionar property_alias O (asset_id + property_id)"
-            }
-        
-        response = sitewise.get_asset_property_value_history(**params)
-        values = response.get('assetPropertyValueHistory', [])
+        formatted_values = format_values(values)
         
-        formatted_values = []
-        for value in values:
-            formatted_values.append({
-                "value": value.get('value'),
-                "timestamp": value.get('timestamp'),
-                "quality": value.get('quality')
-            })
-        
-        return {
+        return store_result(_latest_values_cache, cache_key, {
             "success": True,
             "property_alias": property_alias,
             "asset_id": asset_id,
@@ -536,8 +916,11 @@ def get_latest_values(
             "requested_count": count,
             "actual_count": len(formatted_values),
             "values": formatted_values,
-            "time_range": f"{start_date.isoformat()} to {end_date.isoformat()}"
-        }
+            "time_range": (
+                f"{datetime.fromtimestamp(start_ts, tz=timezone.utc).isoformat()} to "
+                f"{datetime.fromtimestamp(end_ts, tz=timezone.utc).isoformat()}"
+            )
+        })
         
     except ClientError as e:
         return {
@@ -550,17 +933,472 @@ def get_latest_values(
             "error": f"Error obteniendo últimos valores: {str(e)}"
         }
 
+# Límites de entradas por petición de las APIs Batch* de SiteWise
+BATCH_VALUE_MAX_ENTRIES = 128
+BATCH_HISTORY_MAX_ENTRIES = 16
+BATCH_AGGREGATES_MAX_ENTRIES = 16
+BATCH_MAX_WORKERS = 8
+
+# Valores aceptados por BatchGetAssetPropertyAggregates
+AGGREGATE_TYPES = ('AVERAGE', 'COUNT', 'MAXIMUM', 'MINIMUM', 'SUM', 'STANDARD_DEVIATION')
+AGGREGATE_RESOLUTIONS = ('1m', '15m', '1h', '1d')
+
+def build_batch_entries(entries: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    """Convierte las propiedades solicitadas en entradas Batch* de SiteWise (entryId = índice original)"""
+    batch_entries = []
+    for index, entry in enumerate(entries):
+        try:
+            target = resolve_property_target(entry.get('property_alias'), entry.get('asset_id'), entry.get('property_id'))
+        except ValueError:
+            raise ValueError(f"Entrada {index}: debe proporcionar property_alias O (asset_id + property_id)")
+        batch_entries.append({'entryId': str(index), **target})
+    return batch_entries
+
+def run_batch_chunks(fetch_chunk, batch_entries: List[Dict[str, Any]], chunk_size: int) -> Dict[str, Dict[str, Any]]:
+    """Divide las entradas en lotes y los consulta en paralelo, combinando los resultados por entryId"""
+    chunks = [batch_entries[i:i + chunk_size] for i in range(0, len(batch_entries), chunk_size)]
+    results = {}
+    if not chunks:
+        return results
+    
+    with ThreadPoolExecutor(max_workers=min(BATCH_MAX_WORKERS, len(chunks))) as executor:
+        for chunk_results in executor.map(fetch_chunk, chunks):
+            results.update(chunk_results)
+    return results
+
+def collect_batch_errors(response: Dict[str, Any], results: Dict[str, Dict[str, Any]]) -> None:
+    """Registra las entradas con error (o omitidas por error) de una respuesta Batch*"""
+    for entry in response.get('errorEntries', []):
+        results[entry['entryId']] = {
+            "success": False,
+            "error_code": entry.get('errorCode'),
+            "error": entry.get('errorMessage')
+        }
+    for entry in response.get('skippedEntries', []):
+        if entry.get('completionStatus') == 'ERROR' and entry['entryId'] not in results:
+            results[entry['entryId']] = {
+                "success": False,
+                "error_code": entry.get('errorInfo', {}).get('errorCode'),
+                "error": "Entrada omitida por SiteWise"
+            }
+
+def fetch_current_values_chunk(chunk: List[Dict[str, str]]) -> Dict[str, Dict[str, Any]]:
+    """Obtiene los valores actuales de un lote de hasta BATCH_VALUE_MAX_ENTRIES propiedades"""
+    results = {}
+    params = {'entries': chunk}
+    while True:
+        response = get_sitewise_client().batch_get_asset_property_value(**params)
+        for entry in response.get('successEntries', []):
+            property_value = entry.get('assetPropertyValue', {})
+            results[entry['entryId']] = {
+                "success": True,
+                "value": property_value.get('value'),
+                "timestamp": property_value.get('timestamp'),
+                "quality": property_value.get('quality')
+            }
+        collect_batch_errors(response, results)
+        
+        if 'nextToken' not in response:
+            return results
+        params['nextToken'] = response['nextToken']
+
+def fetch_current_value_single(params: Dict[str, str]) -> Dict[str, Any]:
+    """Valor actual de una sola propiedad con GetAssetPropertyValue (errores AWS como resultado de la entrada)"""
+    try:
+        property_value = get_sitewise_client().get_asset_property_value(**params).get('propertyValue', {})
+    except ClientError as e:
+        return {
+            "success": False,
+            "error_code": e.response['Error']['Code'],
+            "error": e.response['Error']['Message']
+        }
+    return {
+        "success": True,
+        "value": property_value.get('value'),
+        "timestamp": property_value.get('timestamp'),
+        "quality": property_value.get('quality')
+    }
+
+def has_pending_entries(chunk: List[Dict[str, Any]], results: Dict[str, Dict[str, Any]], max_results: int) -> bool:
+    """Indica si alguna propiedad del lote (sin error) aún no tiene todos los valores pedidos"""
+    return any(
+        results.get(entry['entryId'], {}).get('success', True)
+        and len(results.get(entry['entryId'], {}).get('values', [])) < max_results
+        for entry in chunk
+    )
+
+def fetch_history_chunk(max_results: int, chunk: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Obtiene el historial de un lote de hasta BATCH_HISTORY_MAX_ENTRIES propiedades"""
+    results = {}
+    params = {'entries': chunk, 'maxResults': min(max_results * len(chunk), 20000)}
+    while True:
+        response = get_sitewise_client().batch_get_asset_property_value_history(**params)
+        for entry in response.get('successEntries', []):
+            result = results.setdefault(entry['entryId'], {"success": True, "values": []})
+            result['values'].extend(format_values(entry.get('assetPropertyValueHistory', [])))
+        collect_batch_errors(response, results)
+        
+        if 'nextToken' not in response or not has_pending_entries(chunk, results, max_results):
+            return results
+        params['nextToken'] = response['nextToken']
+
+def fetch_aggregates_chunk(max_results: int, chunk: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Obtiene los agregados de un lote de hasta BATCH_AGGREGATES_MAX_ENTRIES propiedades"""
+    results = {}
+    params = {'entries': chunk, 'maxResults': min(max_results * len(chunk), 4000)}
+    while True:
+        response = get_sitewise_client().batch_get_asset_property_aggregates(**params)
+        for entry in response.get('successEntries', []):
+            result = results.setdefault(entry['entryId'], {"success": True, "values": []})
+            result['values'].extend(format_values(entry.get('aggregatedValues', [])))
+        collect_batch_errors(response, results)
+        
+        if 'nextToken' not in response or not has_pending_entries(chunk, results, max_results):
+            return results
+        params['nextToken'] = response['nextToken']
+
+# Ventana de agrupación de get_current_value concurrentes (0 desactiva la agrupación)
+BATCH_WINDOW_MS = float(os.getenv('SITEWISE_BATCH_WINDOW_MS', '10'))
+
+class CurrentValueBatcher:
+    """Agrupa las lecturas de valor actual que llegan dentro de una ventana corta en llamadas Batch*"""
+    
+    def __init__(self, window_seconds: float):
+        self.window_seconds = window_seconds
+        self._lock = threading.Lock()
+        self._pending = []
+    
+    def get(self, params: Dict[str, str]) -> Dict[str, Any]:
+        """Encola una lectura; la primera de cada ventana espera y envía el lote completo"""
+        future = Future()
+        with self._lock:
+            self._pending.append((params, future))
+            is_leader = len(self._pending) == 1
+        
+        if is_leader:
+            time.sleep(self.window_seconds)
+            self._flush()
+        return future.result()
+    
+    def _flush(self) -> None:
+        with self._lock:
+            pending, self._pending = self._pending, []
+        
+        batch_entries = [{'entryId': str(index), **params} for index, (params, _) in enumerate(pending)]
+        try:
+            results = run_batch_chunks(fetch_current_values_chunk, batch_entries, BATCH_VALUE_MAX_ENTRIES)
+        except ClientError as e:
+            if len(pending) == 1:
+                pending[0][1].set_exception(e)
+                return
+            # Un lote rechazado entero (p. ej. un alias inválido) no debe fallar a los demás
+            # llamantes de la ventana: cada lectura se repite por separado
+            logger.warning("Lote de valores actuales rechazado (%s); reintentando %d lecturas por separado", e, len(pending))
+            self._flush_individually(pending)
+            return
+        except Exception as e:
+            for _, future in pending:
+                future.set_exception(e)
+            return
+        
+        for index, (_, future) in enumerate(pending):
+            future.set_result(results.get(str(index), {"success": False, "error": "Sin respuesta de SiteWise"}))
+    
+    def _flush_individually(self, pending) -> None:
+        with ThreadPoolExecutor(max_workers=min(BATCH_MAX_WORKERS, len(pending))) as executor:
+            futures = {executor.submit(fetch_current_value_single, params): future for params, future in pending}
+            for single, future in futures.items():
+                try:
+                    future.set_result(single.result())
+                except Exception as e:
+                    future.set_exception(e)
+
+current_value_batcher = CurrentValueBatcher(BATCH_WINDOW_MS / 1000)
+
+@mcp.tool(structured_output=False)
+@run_in_worker_thread
+def get_current_values_batch(entries: List[Dict[str, str]]) -> Dict[str, Any]:
+    """
+    Obtiene el valor actual de varias propiedades con BatchGetAssetPropertyValue.
+    
+    Args:
+        entries: Lista de propiedades, cada una con property_alias O (asset_id + property_id)
+    
+    Returns:
+        Dict con un resultado por propiedad, en el mismo orden de entrada
+    """
+    try:
+        batch_entries = build_batch_entries(entries)
+        results = run_batch_chunks(fetch_current_values_chunk, batch_entries, BATCH_VALUE_MAX_ENTRIES)
+        
+        values = []
+        for index, entry in enumerate(entries):
+            values.append({**entry, **results.get(str(index), {"success": False, "error": "Sin respuesta de SiteWise"})})
+        
+        return {
+            "success": True,
+            "values": values,
+            "count": len(values),
+            "retrieved_at": now_iso()
+        }
+        
+    except ValueError as e:
+        return {
+            "success": False,
+            "error": str(e)
+        }
+    except ClientError as e:
+        return {
+            "success": False,
+            "error": f"Error AWS: {e.response['Error']['Message']}"
+        }
+    except Exception as e:
+        return {
+            "success": False,
+            "error": f"Error obteniendo valores actuales: {str(e)}"
+        }
+
+@mcp.tool(structured_output=False)
+@run_in_worker_thread
+def get_historical_data_batch(
+    entries: List[Dict[str, str]],
+    start_date: str,
+    end_date: str,
+    max_results: int = 100
+) -> Dict[str, Any]:
+    """
+    Obtiene valores históricos de varias propiedades con BatchGetAssetPropertyValueHistory.
+    
+    Args:
+        entries: Lista de propiedades, cada una con property_alias O (asset_id + property_id)
+        start_date: Fecha de inicio (ISO 8601: 2024-01-01T00:00:00Z)
+        end_date: Fecha de fin (ISO 8601: 2024-01-02T00:00:00Z)
+        max_results: Máximo número de valores por propiedad (default: 100)
+    
+    Returns:
+        Dict con los valores históricos de cada propiedad, en el mismo orden de entrada
+    """
+    if max_results < 1:
+        return {
+            "success": False,
+            "error": "max_results debe ser >= 1"
+        }
+    
+    try:
+        batch_entries = build_batch_entries(entries)
+    except ValueError as e:
+        return {
+            "success": False,
+            "error": str(e)
+        }
+    
+    try:
+        start_ts = iso_to_unix(start_date)
+        end_ts = iso_to_unix(end_date)
+        max_results = min(max_results, 20000)
+        
+        batch_entries = [
+            {**batch_entry, 'startDate': start_ts, 'endDate': end_ts, 'timeOrdering': 'ASCENDING'}
+            for batch_entry in batch_entries
+        ]
+        
+        results = run_batch_chunks(
+            functools.partial(fetch_history_chunk, max_results),
+            batch_entries,
+            BATCH_HISTORY_MAX_ENTRIES
+        )
+        
+        properties = []
+        for index, entry in enumerate(entries):
+            result = results.get(str(index), {"success": True, "values": []})
+            if result.get('success'):
+                result['values'] = result['values'][:max_results]
+                result['count'] = len(result['values'])
+            properties.append({**entry, **result})
+        
+        return {
+            "success": True,
+            "start_date": start_date,
+            "end_date": end_date,
+            "properties": properties,
+            "count": len(properties)
+        }
+        
+    except ValueError as e:
+        return {
+            "success": False,
+            "error": f"Formato de fecha inválido: {str(e)}"
+        }
+    except ClientError as e:
+        return {
+            "success": False,
+            "error": f"Error AWS: {e.response['Error']['Message']}"
+        }
+    except Exception as e:
+        return {
+            "success": False,
+            "error": f"Error obteniendo historial: {str(e)}"
+        }
+
+@mcp.tool(structured_output=False)
+@run_in_worker_thread
+def get_aggregates_batch(
+    entries: List[Dict[str, str]],
+    start_date: str,
+    end_date: str,
+    aggregate_types: Optional[List[str]] = None,
+    resolution: str = '1h',
+    max_results: int = 100
+) -> Dict[str, Any]:
+    """
+    Obtiene agregados calculados por SiteWise (promedio, mínimo, máximo...) de varias propiedades
+    con BatchGetAssetPropertyAggregates. Preferir a get_historical_data_batch para estadísticas.
+    
+    Args:
+        entries: Lista de propiedades, cada una con property_alias O (asset_id + property_id)
+        start_date: Fecha de inicio (ISO 8601: 2024-01-01T00:00:00Z)
+        end_date: Fecha de fin (ISO 8601: 2024-01-02T00:00:00Z)
+        aggregate_types: AVERAGE, COUNT, MAXIMUM, MINIMUM, SUM, STANDARD_DEVIATION (default: AVERAGE)
+        resolution: Intervalo de agregación: 1m, 15m, 1h o 1d (default: 1h)
+        max_results: Máximo número de intervalos por propiedad (default: 100)
+    
+    Returns:
+        Dict con los agregados de cada propiedad, en el mismo orden de entrada
+    """
+    aggregate_types = aggregate_types or ['AVERAGE']
+    invalid_types = [t for t in aggregate_types if t not in AGGREGATE_TYPES]
+    if invalid_types:
+        return {
+            "success": False,
+            "error": f"aggregate_types no válidos: {', '.join(invalid_types)} (usar {', '.join(AGGREGATE_TYPES)})"
+        }
+    if resolution not in AGGREGATE_RESOLUTIONS:
+        return {
+            "success": False,
+            "error": f"resolution debe ser {', '.join(AGGREGATE_RESOLUTIONS)}"
+        }
+    if max_results < 1:
+        return {
+            "success": False,
+            "error": "max_results debe ser >= 1"
+        }
+    
+    try:
+        batch_entries = build_batch_entries(entries)
+    except ValueError as e:
+        return {
+            "success": False,
+            "error": str(e)
+        }
+    
+    try:
+        start_ts = iso_to_unix(start_date)
+        end_ts = iso_to_unix(end_date)
+        
+        batch_entries = [
+            {
+                **batch_entry,
+                'aggregateTypes': aggregate_types,
+                'resolution': resolution,
+                'startDate': start_ts,
+                'endDate': end_ts,
+                'timeOrdering': 'ASCENDING'
+            }
+            for batch_entry in batch_entries
+        ]
+        
+        results = run_batch_chunks(
+            functools.partial(fetch_aggregates_chunk, max_results),
+            batch_entries,
+            BATCH_AGGREGATES_MAX_ENTRIES
+        )
+        
+        properties = []
+        for index, entry in enumerate(entries):
+            result = results.get(str(index), {"success": True, "values": []})
+            if result.get('success'):
+                result['values'] = result['values'][:max_results]
+                result['count'] = len(result['values'])
+            properties.append({**entry, **result})
+        
+        return {
+            "success": True,
+            "start_date": start_date,
+            "end_date": end_date,
+            "aggregate_types": aggregate_types,
+            "resolution": resolution,
+            "properties": properties,
+            "count": len(properties)
+        }
+        
+    except ValueError as e:
+        return {
+            "success": False,
+            "error": f"Formato de fecha inválido: {str(e)}"
+        }
+    except ClientError as e:
+        return {
+            "success": False,
+            "error": f"Error AWS: {e.response['Error']['Message']}"
+        }
+    except Exception as e:
+        return {
+            "success": False,
+            "error": f"Error obteniendo agregados: {str(e)}"
+        }
+
+@mcp.tool(structured_output=False)
+@run_in_worker_thread(requires_client=False)
+def invalidate_cache(asset_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Vacía las cachés de metadatos, jerarquía y últimos valores (la próxima consulta va a SiteWise).
+    
+    Args:
+        asset_id: Vaciar solo los metadatos de este activo (y las jerarquías que incluyen propiedades)
+    
+    Returns:
+        Dict con el número de entradas eliminadas
+    """
+    with _cache_lock:
+        if asset_id:
+            # Las jerarquías con propiedades contienen las del activo: también se descartan
+            stale = [(_describe_asset_cache, asset_id), (_asset_graph_cache, True)]
+            stale.extend((_hierarchy_cache, key) for key in list(_hierarchy_cache) if key[0])
+            stale.extend((_alias_ids_cache, alias) for alias, ids in list(_alias_ids_cache.items()) if ids[0] == asset_id)
+            cleared = sum(cache.pop(key, None) is not None for cache, key in stale)
+        else:
+            caches = (
+                _describe_asset_cache,
+                _asset_models_cache,
+                _alias_ids_cache,
+                _asset_graph_cache,
+                _hierarchy_cache,
+                _latest_values_cache
+            )
+            cleared = sum(len(cache) for cache in caches)
+            for cache in caches:
+                cache.clear()
+    
+    return {
+        "success": True,
+        "asset_id": asset_id,
+        "cleared_entries": cleared,
+        "message": f"Caché vaciada: {cleared} entradas eliminadas"
+    }
+
 # Función principal sin logs a stdout
 if __name__ == '__main__':
     try:
         logger.info("🚀 Iniciando servidor MCP SiteWise")
-        if sitewise:
-            logger.info("✅ Servidor listo para conexiones MCP")
-        else:
-            logger.warning("⚠️  Servidor sin conexión SiteWise - verificar credenciales")
         
-        # Solo ejecutar MCP, sin otros prints
-        mcp.run()
+        # Precalentar el cliente en segundo plano sin retrasar el arranque de MCP
+        threading.Thread(target=warm_sitewise_client, name="sitewise-warmup", daemon=True).start()
+        
+        # Solo ejecutar MCP, sin otros prints (con uvloop si está instalado)
+        if uvloop:
+            anyio.run(mcp.run_stdio_async, backend_options={"use_uvloop": True})
+        else:
+            mcp.run()
     except KeyboardInterrupt:
         logger.info("🛑 Servidor detenido por usuario")
     except Exception as e: